@@ -4,18 +4,21 @@ Supports: ACC, RaceRoom, Le Mans Ultimate, Automobilista 2
 """
 
 import asyncio
-import json
+import math
+import operator
+import platform
 import struct
 import time
-from datetime import datetime
-from typing import Dict, List, Optional, Set
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+from dataclasses import dataclass, fields
 from enum import Enum
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client import InfluxDBClient, WritePrecision
+from influxdb_client.client.write_api import WriteOptions
+import msgpack
+import numpy as np
 import uvicorn
 from dotenv import load_dotenv
 import os
@@ -28,6 +31,11 @@ UDP_PORT_R3E = 9997  # RaceRoom Racing Experience
 UDP_PORT_AMS2 = 9998  # Automobilista 2 (Project CARS format)
 UDP_PORT_LMU = 9999  # Le Mans Ultimate (rF2 format)
 WEBSOCKET_PORT = 5001
+FRAME_INTERVAL = 1 / 60  # Demo telemetry rate (60 FPS)
+COACHING_INTERVAL_FRAMES = 6  # Run coaching analysis every 6th frame (10 Hz at 60 FPS)
+CLIENT_QUEUE_SIZE = 4  # Frames buffered per WebSocket client before dropping the oldest
+TELEMETRY_HISTORY_SIZE = 3600  # Frames kept in memory (60s at 60 FPS)
+INFLUX_FLUSH_INTERVAL = 1.0  # Seconds between InfluxDB history flushes
 
 # Telemetry mode control
 telemetry_task = None
@@ -38,6 +46,15 @@ INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN", "my-token")
 INFLUXDB_ORG = os.getenv("INFLUXDB_ORG", "simracing")
 INFLUXDB_BUCKET = os.getenv("INFLUXDB_BUCKET", "telemetry")
 
+# Buffer points client-side and flush in batches instead of one HTTP request per frame.
+# Telemetry is lossy, so a failing batch is only retried briefly (keeps shutdown fast without InfluxDB)
+INFLUXDB_WRITE_OPTIONS = WriteOptions(
+    batch_size=500,
+    flush_interval=1000,
+    jitter_interval=200,
+    max_retry_time=5000
+)
+
 
 class GameType(Enum):
     ACC = "Assetto Corsa Competizione"
@@ -47,7 +64,7 @@ class GameType(Enum):
     DEMO = "Demo Mode"
 
 
-@dataclass
+@dataclass(slots=True)
 class UnifiedTelemetry:
     """Unified telemetry format for all sims"""
     timestamp: float
@@ -130,6 +147,23 @@ class UnifiedTelemetry:
     coaching_messages: List[str]
     coaching_message: Optional[str]  # Latest message
 
+    def to_dict(self) -> Dict:
+        """Shallow dict for serialization (avoids asdict's recursive deep copy)"""
+        return {name: getattr(self, name) for name in _TELEMETRY_FIELDS}
+
+
+# Field names resolved once at import instead of on every frame
+_TELEMETRY_FIELDS = tuple(f.name for f in fields(UnifiedTelemetry))
+
+
+# Fixed coaching messages, built once rather than on every frame
+MSG_TIRE_OVERHEAT = "⚠️ TIRE OVERHEAT: Tires above optimal range (105°C+)"
+MSG_TIRES_COLD = "❄️ Cold tires: Push harder to build temperature (optimal: 80-95°C)"
+MSG_BRAKE_FADE = "🔥 CRITICAL: Brake fade risk! Reduce brake pressure"
+MSG_BRAKES_HOT = "⚠️ High brake temps: Consider cooling lap"
+MSG_PEDAL_OVERLAP = "⚠️ Brake/throttle overlap detected - trail braking or technique issue?"
+MSG_RPM_LIMIT = "🔴 RPM LIMIT: Shift up!"
+
 
 class CoachingEngine:
     """Real-time coaching rules engine"""
@@ -139,37 +173,32 @@ class CoachingEngine:
         """Generate coaching messages based on telemetry"""
         messages = []
         
-        # Tire temperature analysis
-        tire_temps = [
-            telemetry.tire_temp_fl,
-            telemetry.tire_temp_fr,
-            telemetry.tire_temp_rl,
-            telemetry.tire_temp_rr
-        ]
-        avg_tire_temp = sum(tire_temps) / len(tire_temps)
-        temp_variance = max(tire_temps) - min(tire_temps)
+        # Tire temperature analysis (unrolled, no per-frame lists)
+        t_fl = telemetry.tire_temp_fl
+        t_fr = telemetry.tire_temp_fr
+        t_rl = telemetry.tire_temp_rl
+        t_rr = telemetry.tire_temp_rr
+        avg_tire_temp = (t_fl + t_fr + t_rl + t_rr) * 0.25
+        temp_variance = max(t_fl, t_fr, t_rl, t_rr) - min(t_fl, t_fr, t_rl, t_rr)
         
         if avg_tire_temp > 105:
-            messages.append("⚠️ TIRE OVERHEAT: Tires above optimal range (105°C+)")
+            messages.append(MSG_TIRE_OVERHEAT)
         elif avg_tire_temp < 70:
-            messages.append("❄️ Cold tires: Push harder to build temperature (optimal: 80-95°C)")
+            messages.append(MSG_TIRES_COLD)
         
         if temp_variance > 15:
             messages.append(f"⚖️ Tire imbalance: {temp_variance:.1f}°C difference detected")
         
         # Brake temperature
-        brake_temps = [
-            telemetry.brake_temp_fl,
-            telemetry.brake_temp_fr,
-            telemetry.brake_temp_rl,
-            telemetry.brake_temp_rr
-        ]
-        avg_brake_temp = sum(brake_temps) / len(brake_temps)
+        avg_brake_temp = (
+            telemetry.brake_temp_fl + telemetry.brake_temp_fr +
+            telemetry.brake_temp_rl + telemetry.brake_temp_rr
+        ) * 0.25
         
         if avg_brake_temp > 800:
-            messages.append("🔥 CRITICAL: Brake fade risk! Reduce brake pressure")
+            messages.append(MSG_BRAKE_FADE)
         elif avg_brake_temp > 650:
-            messages.append("⚠️ High brake temps: Consider cooling lap")
+            messages.append(MSG_BRAKES_HOT)
         
         # Fuel management
         if telemetry.fuel_level < 0.15:
@@ -178,15 +207,16 @@ class CoachingEngine:
         
         # Driving technique
         if telemetry.throttle > 0.2 and telemetry.brake > 0.2:
-            messages.append("⚠️ Brake/throttle overlap detected - trail braking or technique issue?")
+            messages.append(MSG_PEDAL_OVERLAP)
         
         # RPM management
         if telemetry.rpm > telemetry.max_rpm * 0.95:
-            messages.append("🔴 RPM LIMIT: Shift up!")
+            messages.append(MSG_RPM_LIMIT)
         
         # G-force analysis
-        if abs(telemetry.g_force_lateral) > 2.5:
-            messages.append(f"💨 High lateral G: {abs(telemetry.g_force_lateral):.2f}g")
+        g_lateral = abs(telemetry.g_force_lateral)
+        if g_lateral > 2.5:
+            messages.append(f"💨 High lateral G: {g_lateral:.2f}g")
         
         # Lap time comparison
         if telemetry.best_lap_time < 999 and telemetry.lap_time > 0:
@@ -198,12 +228,127 @@ class CoachingEngine:
         return messages
 
 
+# Fields recorded to InfluxDB: (field key, UnifiedTelemetry attribute, integer field)
+INFLUX_FIELDS = (
+    ("speed", "speed", False),
+    ("rpm", "rpm", True),
+    ("gear", "gear", True),
+    ("throttle", "throttle", False),
+    ("brake", "brake", False),
+    ("steering", "steering", False),
+    ("tire_temp_fl", "tire_temp_fl", False),
+    ("tire_temp_fr", "tire_temp_fr", False),
+    ("tire_temp_rl", "tire_temp_rl", False),
+    ("tire_temp_rr", "tire_temp_rr", False),
+    ("tire_pressure_fl", "tire_pressure_fl", False),
+    ("tire_pressure_fr", "tire_pressure_fr", False),
+    ("tire_pressure_rl", "tire_pressure_rl", False),
+    ("tire_pressure_rr", "tire_pressure_rr", False),
+    ("brake_temp_fl", "brake_temp_fl", False),
+    ("brake_temp_fr", "brake_temp_fr", False),
+    ("brake_temp_rl", "brake_temp_rl", False),
+    ("brake_temp_rr", "brake_temp_rr", False),
+    ("g_lateral", "g_force_lateral", False),
+    ("g_longitudinal", "g_force_longitudinal", False),
+    ("fuel_level", "fuel_level", False),
+    ("lap_time", "lap_time", False),
+    ("lap_distance", "lap_distance", False),
+)
+# Line protocol field set for one history row (integer fields carry the "i" suffix)
+INFLUX_FIELDS_FORMAT = ",".join(
+    f"{key}={{{index}:.0f}}i" if is_integer else f"{key}={{{index}}}"
+    for index, (key, _, is_integer) in enumerate(INFLUX_FIELDS)
+)
+# Reads every INFLUX_FIELDS value from a frame in one call
+read_influx_fields = operator.attrgetter(*(attr for _, attr, _ in INFLUX_FIELDS))
+# Tag value escapes; backslash is included so a trailing one can't escape the next separator
+INFLUX_TAG_ESCAPES = str.maketrans({
+    "\\": "\\\\", ",": "\\,", "=": "\\=", " ": "\\ ",
+    "\n": "\\n", "\r": "\\r", "\t": "\\t",
+})
+
+
+def influx_field_set(values: List[float]) -> str:
+    """Field set for one row, skipping NaN/inf values (invalid line protocol) like Point does"""
+    return ",".join(
+        f"{key}={value:.0f}i" if is_integer else f"{key}={value}"
+        for (key, _, is_integer), value in zip(INFLUX_FIELDS, values)
+        if math.isfinite(value)
+    )
+
+
+def influx_series(telemetry: UnifiedTelemetry) -> str:
+    """Measurement plus escaped, key-sorted tag set (empty values are skipped)"""
+    tags = (
+        ("car", telemetry.car_name),
+        ("game", telemetry.game),
+        ("session_type", telemetry.session_type),
+        ("track", telemetry.track_name),
+    )
+    return "telemetry" + "".join(
+        f",{key}={value.translate(INFLUX_TAG_ESCAPES)}" for key, value in tags if value
+    )
+
+
+class TelemetryRing:
+    """Ring buffer of recent frames stored column-wise (one row per frame, one column per field)"""
+    
+    def __init__(self, size: int = TELEMETRY_HISTORY_SIZE):
+        self.size = size
+        self.values = np.zeros((size, len(INFLUX_FIELDS)), dtype=np.float64)
+        self.timestamps = np.zeros(size, dtype=np.int64)  # ns since epoch
+        self.series: List[str] = [""] * size  # InfluxDB measurement + tags per row
+        self.head = 0  # Total frames appended
+        self.flushed = 0  # Frames already handed to InfluxDB
+        # Tags only change between sessions, so the escaped series key is cached
+        self.tag_values = None
+        self.current_series = ""
+    
+    def append(self, telemetry: UnifiedTelemetry, timestamp_ns: int):
+        """Store one frame, overwriting the oldest row once the ring is full"""
+        row = self.head % self.size
+        self.values[row] = read_influx_fields(telemetry)
+        self.timestamps[row] = timestamp_ns
+        
+        tag_values = (telemetry.car_name, telemetry.game, telemetry.session_type, telemetry.track_name)
+        if tag_values != self.tag_values:
+            self.tag_values = tag_values
+            self.current_series = influx_series(telemetry)
+        self.series[row] = self.current_series
+        self.head += 1
+    
+    def drain_lines(self) -> List[str]:
+        """Line protocol for every frame appended since the last drain"""
+        # Rows more than one ring length behind head have already been overwritten
+        start = max(self.flushed, self.head - self.size)
+        self.flushed = self.head
+        rows = np.arange(start, self.head) % self.size
+        values = self.values[rows]
+        # One non-finite value would make InfluxDB reject the whole batch
+        finite_rows = np.isfinite(values).all(axis=1)
+        
+        lines = []
+        for row, row_values, timestamp, finite in zip(
+            rows.tolist(), values.tolist(), self.timestamps[rows].tolist(), finite_rows.tolist()
+        ):
+            field_set = INFLUX_FIELDS_FORMAT.format(*row_values) if finite else influx_field_set(row_values)
+            if field_set:
+                lines.append(f"{self.series[row]} {field_set} {timestamp}")
+        return lines
+
+
 class TelemetryHub:
     """Central hub for telemetry distribution"""
     
     def __init__(self):
-        self.websocket_clients: Set[WebSocket] = set()
+        # Each client gets a bounded send queue drained by its own writer task
+        self.websocket_clients: Dict[WebSocket, asyncio.Queue] = {}
+        self.client_writers: Dict[WebSocket, asyncio.Task] = {}
         self.latest_telemetry: Optional[UnifiedTelemetry] = None
+        self.latest_frame: Optional[bytes] = None  # latest_telemetry as sent to clients
+        self.frame_count = 0
+        self.coaching_messages: List[str] = []  # Result of the last coaching analysis
+        self.history = TelemetryRing()
         self.influx_client = None
         self.write_api = None
         
@@ -214,7 +359,7 @@ class TelemetryHub:
                 token=INFLUXDB_TOKEN,
                 org=INFLUXDB_ORG
             )
-            self.write_api = self.influx_client.write_api(write_options=SYNCHRONOUS)
+            self.write_api = self.influx_client.write_api(write_options=INFLUXDB_WRITE_OPTIONS)
             print(f"✓ Connected to InfluxDB at {INFLUXDB_URL}")
         except Exception as e:
             print(f"⚠️ InfluxDB not available: {e}")
@@ -223,67 +368,77 @@ class TelemetryHub:
         """Broadcast telemetry to WebSocket clients and InfluxDB"""
         self.latest_telemetry = telemetry
         
-        # Add coaching messages
-        telemetry.coaching_messages = CoachingEngine.analyze(telemetry)
+        # Add coaching messages; conditions change slowly, so reuse the last analysis between runs
+        if self.frame_count % COACHING_INTERVAL_FRAMES == 0:
+            self.coaching_messages = CoachingEngine.analyze(telemetry)
+        self.frame_count += 1
+        telemetry.coaching_messages = self.coaching_messages
         
         # Broadcast to WebSocket clients
-        data = json.dumps(asdict(telemetry))
-        disconnected = set()
+        data = msgpack.packb(telemetry.to_dict())
+        self.latest_frame = data
+        # One ASGI message shared by every client; send_bytes() would build a new one per client
+        message = {"type": "websocket.send", "bytes": data}
         
-        # Iterate over a copy to avoid "set changed size during iteration" error
-        for client in list(self.websocket_clients):
-            try:
-                await client.send_text(data)
-            except Exception:
-                disconnected.add(client)
+        # Hand off to the writer tasks without awaiting, so a slow client can't
+        # stall the producer; telemetry is lossy, so a full queue drops its oldest frame
+        for queue in self.websocket_clients.values():
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
         
-        # Remove disconnected clients
-        self.websocket_clients -= disconnected
+        # Record history; influx_flush_loop() writes it to InfluxDB in batches
+        self.history.append(telemetry, time.time_ns())
+    
+    def flush_history(self):
+        """Write history recorded since the last flush to InfluxDB"""
+        if not self.write_api:
+            return
         
-        # Write to InfluxDB
+        try:
+            lines = self.history.drain_lines()
+            if lines:
+                self.write_api.write(bucket=INFLUXDB_BUCKET, record=lines, write_precision=WritePrecision.NS)
+        except Exception as e:
+            print(f"InfluxDB write error: {e}")
+    
+    async def influx_flush_loop(self):
+        """Periodically flush telemetry history to InfluxDB"""
+        while True:
+            await asyncio.sleep(INFLUX_FLUSH_INTERVAL)
+            self.flush_history()
+    
+    def close(self):
+        """Flush buffered InfluxDB points and release the client"""
         if self.write_api:
-            try:
-                point = Point("telemetry") \
-                    .tag("game", telemetry.game) \
-                    .tag("session_type", telemetry.session_type) \
-                    .tag("track", telemetry.track_name) \
-                    .tag("car", telemetry.car_name) \
-                    .field("speed", telemetry.speed) \
-                    .field("rpm", telemetry.rpm) \
-                    .field("gear", telemetry.gear) \
-                    .field("throttle", telemetry.throttle) \
-                    .field("brake", telemetry.brake) \
-                    .field("steering", telemetry.steering) \
-                    .field("tire_temp_fl", telemetry.tire_temp_fl) \
-                    .field("tire_temp_fr", telemetry.tire_temp_fr) \
-                    .field("tire_temp_rl", telemetry.tire_temp_rl) \
-                    .field("tire_temp_rr", telemetry.tire_temp_rr) \
-                    .field("tire_pressure_fl", telemetry.tire_pressure_fl) \
-                    .field("tire_pressure_fr", telemetry.tire_pressure_fr) \
-                    .field("tire_pressure_rl", telemetry.tire_pressure_rl) \
-                    .field("tire_pressure_rr", telemetry.tire_pressure_rr) \
-                    .field("brake_temp_fl", telemetry.brake_temp_fl) \
-                    .field("brake_temp_fr", telemetry.brake_temp_fr) \
-                    .field("brake_temp_rl", telemetry.brake_temp_rl) \
-                    .field("brake_temp_rr", telemetry.brake_temp_rr) \
-                    .field("g_lateral", telemetry.g_force_lateral) \
-                    .field("g_longitudinal", telemetry.g_force_longitudinal) \
-                    .field("fuel_level", telemetry.fuel_level) \
-                    .field("lap_time", telemetry.lap_time) \
-                    .field("lap_distance", telemetry.lap_distance) \
-                    .time(datetime.utcnow())
-                
-                self.write_api.write(bucket=INFLUXDB_BUCKET, record=point)
-            except Exception as e:
-                print(f"InfluxDB write error: {e}")
+            self.flush_history()
+            # close() flushes whatever is still batched before stopping the writer
+            self.write_api.close()
+            self.write_api = None
+        if self.influx_client:
+            self.influx_client.close()
     
     def add_websocket_client(self, websocket: WebSocket):
-        """Add WebSocket client"""
-        self.websocket_clients.add(websocket)
+        """Add WebSocket client and start its writer task"""
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.websocket_clients[websocket] = queue
+        self.client_writers[websocket] = asyncio.create_task(self._client_writer(websocket, queue))
     
     def remove_websocket_client(self, websocket: WebSocket):
-        """Remove WebSocket client"""
-        self.websocket_clients.discard(websocket)
+        """Remove WebSocket client and stop its writer task"""
+        self.websocket_clients.pop(websocket, None)
+        writer = self.client_writers.pop(websocket, None)
+        if writer and writer is not asyncio.current_task():
+            writer.cancel()
+    
+    async def _client_writer(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Send queued messages to one client until its connection fails"""
+        try:
+            while True:
+                message = await queue.get()
+                await websocket.send(message)
+        except Exception:
+            self.remove_websocket_client(websocket)
 
 
 # Global telemetry hub
@@ -305,12 +460,13 @@ app.add_middleware(
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time telemetry"""
     await websocket.accept()
-    telemetry_hub.add_websocket_client(websocket)
     
     try:
-        # Send initial data if available
-        if telemetry_hub.latest_telemetry:
-            await websocket.send_text(json.dumps(asdict(telemetry_hub.latest_telemetry)))
+        # Send initial data if available (before registering, so it can't interleave with the writer task)
+        if telemetry_hub.latest_frame:
+            await websocket.send_bytes(telemetry_hub.latest_frame)
+        
+        telemetry_hub.add_websocket_client(websocket)
         
         # Keep connection alive
         while True:
@@ -376,6 +532,17 @@ async def udp_receiver_lmu():
     pass
 
 
+# Demo leaderboard: entries are static, only best_lap follows the simulator
+DEMO_LEADERBOARD = [
+    {"position": 1, "car_number": "77", "driver_name": "You", "gap": "LEAD", "best_lap": None, "sector_1": 30.234, "sector_2": 48.567, "sector_3": 28.123},
+    {"position": 2, "car_number": "33", "driver_name": "M. Verstappen", "gap": "+2.345", "best_lap": None, "sector_1": 30.345, "sector_2": 48.678, "sector_3": 28.234},
+    {"position": 3, "car_number": "44", "driver_name": "L. Hamilton", "gap": "+5.678", "best_lap": None, "sector_1": 30.456, "sector_2": 48.789, "sector_3": 28.345},
+    {"position": 4, "car_number": "16", "driver_name": "C. Leclerc", "gap": "+8.912", "best_lap": None, "sector_1": 30.567, "sector_2": 48.890, "sector_3": 28.456},
+    {"position": 5, "car_number": "55", "driver_name": "C. Sainz", "gap": "+12.234", "best_lap": None, "sector_1": 30.678, "sector_2": 48.901, "sector_3": 28.567},
+]
+DEMO_BEST_LAP_OFFSETS = (0.0, 0.234, 0.567, 0.891, 1.234)  # Seconds behind the player's best lap
+
+
 async def demo_mode():
     """Demo mode with simulated telemetry"""
     global telemetry_running
@@ -384,74 +551,131 @@ async def demo_mode():
     from demo_telemetry_generator import GT3TelemetrySimulator
     
     simulator = GT3TelemetrySimulator()
+    loop = asyncio.get_running_loop()
+    next_frame = loop.time()
+    leaderboard_best_lap = None
+    
+    # One instance is reused for every frame: static values are set here and the rest are
+    # overwritten in place (broadcast_telemetry serializes the frame before it returns)
+    unified = UnifiedTelemetry(
+        timestamp=0.0,
+        game=GameType.DEMO.value,
+        speed=0.0,
+        rpm=0,
+        gear=0,
+        max_rpm=0,
+        lap_distance=0.0,
+        lap_time=0.0,
+        lap_number=0,
+        last_lap_time=0.0,
+        best_lap_time=0.0,
+        current_lap_time=0.0,
+        throttle=0.0,
+        brake=0.0,
+        clutch=0.0,
+        steering=0.0,
+        g_force_lateral=0.0,
+        g_force_longitudinal=0.0,
+        g_force_vertical=0.0,
+        tire_temp_fl=0.0,
+        tire_temp_fr=0.0,
+        tire_temp_rl=0.0,
+        tire_temp_rr=0.0,
+        tire_pressure_fl=0.0,
+        tire_pressure_fr=0.0,
+        tire_pressure_rl=0.0,
+        tire_pressure_rr=0.0,
+        brake_temp_fl=0.0,
+        brake_temp_fr=0.0,
+        brake_temp_rl=0.0,
+        brake_temp_rr=0.0,
+        oil_temp=0.0,
+        water_temp=0.0,
+        fuel_level=0.0,
+        fuel=0.0,
+        fuel_laps=0,
+        tc=2,  # Traction control level
+        abs=3,  # ABS level
+        brake_bias=0.56,  # 56% front
+        engine_map=1,  # Engine map 1
+        position=1,
+        total_cars=20,  # 20 car grid
+        session_type="",
+        session_time_remaining=0.0,
+        track_name="Spa-Francorchamps",
+        car_name="Mercedes-AMG GT3",
+        sector_1_delta=None,
+        sector_2_delta=None,
+        sector_3_delta=None,
+        leaderboard=DEMO_LEADERBOARD,
+        coaching_messages=[],
+        coaching_message=None  # Will be set by CoachingEngine
+    )
     
     while telemetry_running:
         frame = simulator.generate_frame()
         
-        # Convert to unified format
-        unified = UnifiedTelemetry(
-            timestamp=frame.timestamp,
-            game=GameType.DEMO.value,
-            speed=frame.speed,
-            rpm=frame.rpm,
-            gear=frame.gear,
-            max_rpm=frame.max_rpm,
-            lap_distance=frame.lap_distance,
-            lap_time=frame.lap_time,
-            lap_number=frame.lap_number,
-            last_lap_time=frame.last_lap_time,
-            best_lap_time=frame.best_lap_time,
-            current_lap_time=frame.lap_time,  # Alias for frontend
-            throttle=frame.throttle,
-            brake=frame.brake,
-            clutch=frame.clutch,
-            steering=frame.steering,
-            g_force_lateral=frame.g_force_lateral,
-            g_force_longitudinal=frame.g_force_longitudinal,
-            g_force_vertical=frame.g_force_vertical,
-            tire_temp_fl=frame.tire_temp_fl,
-            tire_temp_fr=frame.tire_temp_fr,
-            tire_temp_rl=frame.tire_temp_rl,
-            tire_temp_rr=frame.tire_temp_rr,
-            tire_pressure_fl=frame.tire_pressure_fl,
-            tire_pressure_fr=frame.tire_pressure_fr,
-            tire_pressure_rl=frame.tire_pressure_rl,
-            tire_pressure_rr=frame.tire_pressure_rr,
-            brake_temp_fl=frame.brake_temp_fl,
-            brake_temp_fr=frame.brake_temp_fr,
-            brake_temp_rl=frame.brake_temp_rl,
-            brake_temp_rr=frame.brake_temp_rr,
-            oil_temp=frame.oil_temp,
-            water_temp=frame.water_temp,
-            fuel_level=frame.fuel_level,
-            fuel=frame.fuel_level * 120.0,  # Convert percentage to liters (120L tank)
-            fuel_laps=int(frame.fuel_remaining_laps),
-            tc=2,  # Traction control level
-            abs=3,  # ABS level
-            brake_bias=0.56,  # 56% front
-            engine_map=1,  # Engine map 1
-            position=1 + (simulator.lap_number % 3),  # Simulate position changes 1-3
-            total_cars=20,  # 20 car grid
-            session_type=frame.session_type,
-            session_time_remaining=1800.0 - (simulator.lap_time + (simulator.lap_number - 1) * 150.0),  # 30 min session
-            track_name="Spa-Francorchamps",
-            car_name="Mercedes-AMG GT3",
-            sector_1_delta=-0.234 if simulator.best_lap_time < 999 else None,
-            sector_2_delta=0.156 if simulator.best_lap_time < 999 else None,
-            sector_3_delta=-0.089 if simulator.best_lap_time < 999 else None,
-            leaderboard=[
-                {"position": 1, "car_number": "77", "driver_name": "You", "gap": "LEAD", "best_lap": simulator.best_lap_time if simulator.best_lap_time < 999 else None, "sector_1": 30.234, "sector_2": 48.567, "sector_3": 28.123},
-                {"position": 2, "car_number": "33", "driver_name": "M. Verstappen", "gap": "+2.345", "best_lap": simulator.best_lap_time + 0.234 if simulator.best_lap_time < 999 else None, "sector_1": 30.345, "sector_2": 48.678, "sector_3": 28.234},
-                {"position": 3, "car_number": "44", "driver_name": "L. Hamilton", "gap": "+5.678", "best_lap": simulator.best_lap_time + 0.567 if simulator.best_lap_time < 999 else None, "sector_1": 30.456, "sector_2": 48.789, "sector_3": 28.345},
-                {"position": 4, "car_number": "16", "driver_name": "C. Leclerc", "gap": "+8.912", "best_lap": simulator.best_lap_time + 0.891 if simulator.best_lap_time < 999 else None, "sector_1": 30.567, "sector_2": 48.890, "sector_3": 28.456},
-                {"position": 5, "car_number": "55", "driver_name": "C. Sainz", "gap": "+12.234", "best_lap": simulator.best_lap_time + 1.234 if simulator.best_lap_time < 999 else None, "sector_1": 30.678, "sector_2": 48.901, "sector_3": 28.567},
-            ],
-            coaching_messages=[],
-            coaching_message=None  # Will be set by CoachingEngine
-        )
+        # Best lap only changes at lap completion, so the leaderboard and sector deltas are updated then
+        if simulator.best_lap_time != leaderboard_best_lap:
+            leaderboard_best_lap = simulator.best_lap_time
+            has_best_lap = leaderboard_best_lap < 999
+            for entry, offset in zip(DEMO_LEADERBOARD, DEMO_BEST_LAP_OFFSETS):
+                entry["best_lap"] = leaderboard_best_lap + offset if has_best_lap else None
+            unified.sector_1_delta = -0.234 if has_best_lap else None
+            unified.sector_2_delta = 0.156 if has_best_lap else None
+            unified.sector_3_delta = -0.089 if has_best_lap else None
+        
+        # Copy the simulated frame into the unified format
+        unified.timestamp = frame.timestamp
+        unified.speed = frame.speed
+        unified.rpm = frame.rpm
+        unified.gear = frame.gear
+        unified.max_rpm = frame.max_rpm
+        unified.lap_distance = frame.lap_distance
+        unified.lap_time = frame.lap_time
+        unified.lap_number = frame.lap_number
+        unified.last_lap_time = frame.last_lap_time
+        unified.best_lap_time = frame.best_lap_time
+        unified.current_lap_time = frame.lap_time  # Alias for frontend
+        unified.throttle = frame.throttle
+        unified.brake = frame.brake
+        unified.clutch = frame.clutch
+        unified.steering = frame.steering
+        unified.g_force_lateral = frame.g_force_lateral
+        unified.g_force_longitudinal = frame.g_force_longitudinal
+        unified.g_force_vertical = frame.g_force_vertical
+        unified.tire_temp_fl = frame.tire_temp_fl
+        unified.tire_temp_fr = frame.tire_temp_fr
+        unified.tire_temp_rl = frame.tire_temp_rl
+        unified.tire_temp_rr = frame.tire_temp_rr
+        unified.tire_pressure_fl = frame.tire_pressure_fl
+        unified.tire_pressure_fr = frame.tire_pressure_fr
+        unified.tire_pressure_rl = frame.tire_pressure_rl
+        unified.tire_pressure_rr = frame.tire_pressure_rr
+        unified.brake_temp_fl = frame.brake_temp_fl
+        unified.brake_temp_fr = frame.brake_temp_fr
+        unified.brake_temp_rl = frame.brake_temp_rl
+        unified.brake_temp_rr = frame.brake_temp_rr
+        unified.oil_temp = frame.oil_temp
+        unified.water_temp = frame.water_temp
+        unified.fuel_level = frame.fuel_level
+        unified.fuel = frame.fuel_level * 120.0  # Convert percentage to liters (120L tank)
+        unified.fuel_laps = int(frame.fuel_remaining_laps)
+        unified.position = 1 + (simulator.lap_number % 3)  # Simulate position changes 1-3
+        unified.session_type = frame.session_type
+        unified.session_time_remaining = 1800.0 - (simulator.lap_time + (simulator.lap_number - 1) * 150.0)  # 30 min session
         
         await telemetry_hub.broadcast_telemetry(unified)
-        await asyncio.sleep(0.016)  # 60 FPS
+        
+        # Sleep until the next frame slot so broadcast time doesn't add up as drift;
+        # after an overrun, resync rather than bursting to catch up
+        next_frame += FRAME_INTERVAL
+        delay = next_frame - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            next_frame = loop.time()
+            await asyncio.sleep(0)  # still yield to the event loop
 
 
 async def acc_mode():
@@ -625,6 +849,15 @@ async def startup_event():
     
     # Start auto-detection loop in background
     asyncio.create_task(auto_detect_loop())
+    
+    # Write telemetry history to InfluxDB in the background
+    asyncio.create_task(telemetry_hub.influx_flush_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending telemetry writes"""
+    telemetry_hub.close()
 
 
 if __name__ == "__main__":
@@ -632,5 +865,7 @@ if __name__ == "__main__":
         app,
         host="0.0.0.0",
         port=WEBSOCKET_PORT,
-        log_level="info"
+        log_level="info",
+        # uvloop has no Windows build; use the default asyncio loop there
+        loop="asyncio" if platform.system() == "Windows" else "uvloop"
     )
@@ -3,6 +3,8 @@ Automobilista 2 (AMS2) Telemetry Reader
 Uses UDP to receive telemetry from AMS2
 """
 
+import asyncio
+import platform
 import socket
 import struct
 from typing import Optional
@@ -21,24 +23,76 @@ class AMS2Reader(BaseTelemetryReader):
     """
     
     DEFAULT_PORT = 9998
-    PACKET_SIZE = 1367  # Project CARS 2 telemetry packet size
+    PACKET_SIZE = 1367  # Receive buffer size, larger than any pCARS2 packet
     
     # Packet types
     PACKET_TYPE_TELEMETRY = 0
     PACKET_TYPE_RACE_DATA = 1
     PACKET_TYPE_PARTICIPANTS = 2
     
+    # PacketBase header: packet number, category packet number,
+    # partial index, partial count, packet type, version
+    PACKET_BASE_SIZE = 12
+    PACKET_TYPE_OFFSET = 10
+    
+    # Car physics packet (sTelemetryData), pre-compiled once so each packet
+    # is decoded by a single unpack_from call. Pad bytes (x) skip fields
+    # the dashboard doesn't use.
+    TELEMETRY_STRUCT = struct.Struct(
+        '<18x'
+        'h2x'      # 18 sOilTempCelsius
+        'h4x'      # 22 sWaterTempCelsius
+        'B'        # 28 sFuelCapacity (liters)
+        'BBB'      # 29 sBrake, sThrottle, sClutch (0-255)
+        'f'        # 32 sFuelLevel (0.0-1.0)
+        'f'        # 36 sSpeed (m/s)
+        'HH'       # 40 sRpm, sMaxRpm
+        'bB54x'    # 44 sSteering (-127..127), sGearNumGears
+        '3f64x'    # 100 sLocalAcceleration (x, y, z in m/s^2)
+        '4B28x'    # 176 sTyreTemp (Celsius)
+        '4h136x'   # 208 sBrakeTempCelsius
+        '4H'       # 352 sAirPressure (kPa)
+    )
+    
+    # Room for a few seconds of packets so event loop stalls don't drop data.
+    # The kernel clamps this to net.core.rmem_max
+    RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+    
+    # Linux only; not every Python build exports socket.SO_BUSY_POLL
+    SO_BUSY_POLL = getattr(socket, 'SO_BUSY_POLL', 46)
+    BUSY_POLL_USEC = 50
+    
+    TELEMETRY_PACKET_SIZE = 559  # sTelemetryData, protocol version 2
+    
+    GRAVITY = 9.81
+    KPA_TO_PSI = 0.145038
+    GEAR_REVERSE = 15
+    
     def __init__(self, port: int = DEFAULT_PORT):
         super().__init__()
         self.port = port
         self.socket = None
+        self.reader_registered = False
+        
+        # Reused for every datagram; the parser reads straight out of it
+        self.recv_buffer = bytearray(self.PACKET_SIZE)
+        self.recv_view = memoryview(self.recv_buffer)
+        
+        # Packet parsers indexed by PacketBase type (see PACKET_TYPE_*);
+        # types past the end of the table aren't decoded yet
+        self._handlers = (
+            self._parse_telemetry_packet,
+        )
     
     async def connect(self) -> bool:
         """Connect UDP socket"""
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.socket.bind(('', self.port))
-            self.socket.settimeout(0.1)  # 100ms timeout
+            self._tune_socket()
+            # Non-blocking so read_telemetry can drain the queue without
+            # stalling the event loop when nothing is pending
+            self.socket.setblocking(False)
             print(f"AMS2 Reader: Listening on UDP port {self.port}")
             return True
             
@@ -46,55 +100,149 @@ class AMS2Reader(BaseTelemetryReader):
             print(f"AMS2 Reader: Failed to bind UDP socket: {e}")
             return False
     
+    def _tune_socket(self):
+        """Enlarge the receive buffer and enable busy polling where supported"""
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.RECEIVE_BUFFER_SIZE)
+        
+        # Linux reports double the usable size; both are far above the default
+        # unless the request was clamped by rmem_max
+        actual = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if actual < self.RECEIVE_BUFFER_SIZE:
+            print(f"AMS2 Reader: Receive buffer limited to {actual} bytes "
+                  f"(raise net.core.rmem_max for {self.RECEIVE_BUFFER_SIZE})")
+        
+        if platform.system() == "Linux":
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, self.SO_BUSY_POLL, self.BUSY_POLL_USEC)
+            except OSError:
+                # Raising busy poll above net.core.busy_read needs CAP_NET_ADMIN
+                pass
+    
     async def read_telemetry(self) -> Optional[UnifiedTelemetryData]:
-        """Read telemetry from UDP packets"""
+        """Drain all pending UDP packets and return the newest telemetry"""
         if not self.socket:
             return None
         
+        samples = []
+        self._drain_socket(samples.append)
+        return samples[-1] if samples else None
+    
+    def register_with_loop(self, loop: asyncio.AbstractEventLoop, on_data) -> bool:
+        """Have the event loop call us whenever datagrams are waiting"""
+        if not self.socket:
+            return False
+        
         try:
-            # Receive UDP packet
-            data, addr = self.socket.recvfrom(self.PACKET_SIZE)
-            
-            if len(data) < 10:
-                return None
-            
-            # Parse packet header
-            packet_type = struct.unpack('B', data[0:1])[0]
-            
-            if packet_type == self.PACKET_TYPE_TELEMETRY:
-                return self._parse_telemetry_packet(data)
-            
-            # Handle other packet types for additional data
-            # (race data, participants, etc.)
-            
-            return None
-            
-        except socket.timeout:
-            return None
+            loop.add_reader(self.socket.fileno(), self._drain_socket, on_data)
+        except NotImplementedError:
+            # Windows' default ProactorEventLoop has no add_reader; fall
+            # back to polling the non-blocking socket
+            return False
+        self.reader_registered = True
+        return True
+    
+    def unregister_from_loop(self, loop: asyncio.AbstractEventLoop):
+        """Stop watching the UDP socket"""
+        if self.socket and self.reader_registered:
+            loop.remove_reader(self.socket.fileno())
+            self.reader_registered = False
+    
+    def _drain_socket(self, on_data):
+        """Read every pending datagram and pass each parsed sample to on_data"""
+        try:
+            # Several packets (physics, timings, etc.) can queue up between
+            # wakeups; read them all in one go
+            while True:
+                size = self.socket.recv_into(self.recv_buffer)
+                telemetry = self._parse_packet(self.recv_view[:size])
+                if telemetry:
+                    on_data(telemetry)
+                    
+        except BlockingIOError:
+            pass
         except Exception as e:
             print(f"AMS2 Reader: Error reading UDP: {e}")
+    
+    def _parse_packet(self, data: memoryview) -> Optional[UnifiedTelemetryData]:
+        """Dispatch a single UDP packet by its PacketBase type"""
+        if len(data) < self.PACKET_BASE_SIZE:
+            return None
+        
+        # Parse packet header
+        packet_type = data[self.PACKET_TYPE_OFFSET]
+        
+        if packet_type >= len(self._handlers):
             return None
+        
+        return self._handlers[packet_type](data)
     
-    def _parse_telemetry_packet(self, data: bytes) -> Optional[UnifiedTelemetryData]:
+    def _parse_telemetry_packet(self, data: memoryview) -> Optional[UnifiedTelemetryData]:
         """Parse Project CARS 2 telemetry packet"""
         try:
-            # TODO: Implement full packet parsing
-            # Reference: Project CARS 2 UDP specification
-            # Packet structure includes (offsets approximate):
-            # - Header (packet type, version, etc.)
-            # - Game state
-            # - Session type
-            # - Participant data
-            # - Unfiltered input
-            # - Car state (position, velocity, etc.)
-            # - Wheel data (tire temps, pressures, etc.)
-            # - etc.
+            # pCARS2 packets carry no checksum; an exact length match rejects
+            # truncated datagrams and Project CARS 1 format packets
+            if len(data) != self.TELEMETRY_PACKET_SIZE:
+                return None
             
-            # Example parsing (simplified):
-            # speed_ms = struct.unpack('f', data[offset:offset+4])[0]
-            # speed_kmh = speed_ms * 3.6
+            (oil_temp, water_temp, fuel_capacity, brake, throttle, clutch,
+             fuel_level, speed, rpm, max_rpm, steering, gear_num_gears,
+             accel_x, accel_y, accel_z,
+             tyre_fl, tyre_fr, tyre_rl, tyre_rr,
+             brake_fl, brake_fr, brake_rl, brake_rr,
+             press_fl, press_fr, press_rl, press_rr) = self.TELEMETRY_STRUCT.unpack_from(data)
             
-            return None
+            # Low nibble is the current gear (15 = reverse), high nibble is gear count
+            gear = gear_num_gears & 0x0F
+            if gear == self.GEAR_REVERSE:
+                gear = -1
+            
+            # Lap, position and session info arrive in the timings/race
+            # definition packets, which aren't parsed yet
+            return UnifiedTelemetryData(
+                speed=speed * 3.6,
+                rpm=rpm,
+                gear=gear,
+                max_rpm=max_rpm,
+                lap_distance=0.0,
+                lap_time=0.0,
+                lap_number=0,
+                last_lap_time=0.0,
+                best_lap_time=0.0,
+                throttle=throttle / 255,
+                brake=brake / 255,
+                clutch=clutch / 255,
+                steering=steering / 127,
+                g_force_lateral=accel_x / self.GRAVITY,
+                g_force_longitudinal=accel_z / self.GRAVITY,
+                g_force_vertical=accel_y / self.GRAVITY,
+                tire_temp_fl=tyre_fl,
+                tire_temp_fr=tyre_fr,
+                tire_temp_rl=tyre_rl,
+                tire_temp_rr=tyre_rr,
+                tire_pressure_fl=press_fl * self.KPA_TO_PSI,
+                tire_pressure_fr=press_fr * self.KPA_TO_PSI,
+                tire_pressure_rl=press_rl * self.KPA_TO_PSI,
+                tire_pressure_rr=press_rr * self.KPA_TO_PSI,
+                brake_temp_fl=brake_fl,
+                brake_temp_fr=brake_fr,
+                brake_temp_rl=brake_rl,
+                brake_temp_rr=brake_rr,
+                oil_temp=oil_temp,
+                water_temp=water_temp,
+                fuel_level=fuel_level,
+                fuel=fuel_level * fuel_capacity,
+                fuel_laps=0,
+                tc=0,
+                abs=0,
+                brake_bias=0.0,
+                engine_map=0,
+                position=0,
+                total_cars=0,
+                session_type="Unknown",
+                session_time_remaining=0.0,
+                track_name="",
+                car_name="",
+            )
             
         except Exception as e:
             print(f"AMS2 Reader: Error parsing telemetry packet: {e}")
@@ -104,11 +252,18 @@ class AMS2Reader(BaseTelemetryReader):
         """Close UDP socket"""
         if self.socket:
             self.socket.close()
+            self.socket = None
 
 
 # Reference Implementation Notes:
 # - AMS2 uses Project CARS 2 UDP format
 # - Enable UDP output in AMS2 settings (Options -> System -> UDP Frequency)
 # - Default port: 9998 (configurable in game settings)
-# - Packet structure: See Project CARS 2 UDP specification
+# - Packet structure: See Project CARS 2 UDP specification (SMS_UDP_Definitions.hpp,
+#   protocol version 2). Every packet starts with a 12-byte PacketBase; the packet
+#   type is at byte 10 (byte 0 is the running packet number)
 # - Data rate: Configurable (1-60Hz)
+# - Socket tuning (Linux): the reader asks for a 4 MB receive buffer, which the
+#   kernel caps at net.core.rmem_max. To allow it, run as root:
+#     sysctl -w net.core.rmem_max=16777216
+#     sysctl -w net.core.busy_read=50   # optional, lets SO_BUSY_POLL take effect
@@ -3,12 +3,13 @@ Base class for all telemetry readers
 """
 
 from abc import ABC, abstractmethod
+from collections import deque
 from dataclasses import dataclass
 from typing import Optional
 import asyncio
 
 
-@dataclass
+@dataclass(slots=True)
 class UnifiedTelemetryData:
     """Unified telemetry data structure"""
     # Basic
@@ -84,9 +85,17 @@ class UnifiedTelemetryData:
 class BaseTelemetryReader(ABC):
     """Base class for all telemetry readers"""
     
+    # Samples buffered between a readiness callback and a slow consumer;
+    # once full the oldest are dropped so the callback always sees fresh data
+    READY_BUFFER_SIZE = 8
+    
+    POLL_INTERVAL = 1 / 60  # Fallback polling rate (60 FPS)
+    
     def __init__(self):
         self.running = False
         self.latest_data: Optional[UnifiedTelemetryData] = None
+        self.ready_samples: deque = deque(maxlen=self.READY_BUFFER_SIZE)
+        self.data_ready: Optional[asyncio.Event] = None
     
     @abstractmethod
     async def connect(self) -> bool:
@@ -109,6 +118,20 @@ class BaseTelemetryReader(ABC):
         """Disconnect from telemetry source"""
         pass
     
+    def register_with_loop(self, loop: asyncio.AbstractEventLoop, on_data) -> bool:
+        """
+        Register the telemetry source with the event loop for readiness callbacks
+        
+        Readers with a pollable source (e.g. a UDP socket) override this and
+        call on_data with each parsed UnifiedTelemetryData.
+        Returns True if registered, False to fall back to polling read_telemetry
+        """
+        return False
+    
+    def unregister_from_loop(self, loop: asyncio.AbstractEventLoop):
+        """Undo register_with_loop"""
+        pass
+    
     async def start(self, callback):
         """
         Start reading telemetry and call callback with each update
@@ -124,17 +147,51 @@ class BaseTelemetryReader(ABC):
         
         print(f"{self.__class__.__name__}: Connected")
         
+        loop = asyncio.get_running_loop()
+        self.ready_samples.clear()
+        self.data_ready = asyncio.Event()
+        
         try:
-            while self.running:
-                data = await self.read_telemetry()
-                if data:
-                    self.latest_data = data
-                    await callback(data)
-                await asyncio.sleep(0.016)  # ~60 FPS
+            if self.register_with_loop(loop, self._push_sample):
+                # Event-driven: only wake up when the source has new data
+                while self.running:
+                    await self.data_ready.wait()
+                    self.data_ready.clear()
+                    while self.ready_samples and self.running:
+                        data = self.ready_samples.popleft()
+                        self.latest_data = data
+                        await callback(data)
+            else:
+                next_poll = loop.time()
+                while self.running:
+                    data = await self.read_telemetry()
+                    if data:
+                        self.latest_data = data
+                        await callback(data)
+                    
+                    # Sleep until the next poll slot so read/callback time doesn't
+                    # add up as drift; after an overrun, resync rather than bursting
+                    next_poll += self.POLL_INTERVAL
+                    delay = next_poll - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        next_poll = loop.time()
+                        await asyncio.sleep(0)
         finally:
+            self.unregister_from_loop(loop)
+            self.data_ready = None
             await self.disconnect()
             print(f"{self.__class__.__name__}: Disconnected")
     
     async def stop(self):
         """Stop reading telemetry"""
         self.running = False
+        if self.data_ready:
+            # Wake the event-driven loop so it can exit
+            self.data_ready.set()
+    
+    def _push_sample(self, data: UnifiedTelemetryData):
+        """Readiness callback target: buffer a sample for the consumer loop"""
+        self.ready_samples.append(data)
+        self.data_ready.set()
@@ -3,11 +3,271 @@ Le Mans Ultimate (LMU) Telemetry Reader
 Uses shared memory (rFactor 2 format) to read telemetry from LMU
 """
 
+import ctypes
+import math
+import mmap
 import platform
+import struct
 from typing import Optional
 from .base_reader import BaseTelemetryReader, UnifiedTelemetryData
 
 
+# rF2 shared memory structures (rF2State.h, packed to 4 bytes).
+# Overlaid on a copy of the mapped buffer so each field read is a plain
+# attribute access instead of a struct.unpack per field.
+
+RF2_MAX_MAPPED_VEHICLES = 128
+
+
+class RF2Vec3(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ('x', ctypes.c_double),
+        ('y', ctypes.c_double),
+        ('z', ctypes.c_double),
+    ]
+
+
+class RF2Wheel(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ('mSuspensionDeflection', ctypes.c_double),
+        ('mRideHeight', ctypes.c_double),
+        ('mSuspForce', ctypes.c_double),
+        ('mBrakeTemp', ctypes.c_double),  # Kelvin
+        ('mBrakePressure', ctypes.c_double),
+        ('mRotation', ctypes.c_double),
+        ('mLateralPatchVel', ctypes.c_double),
+        ('mLongitudinalPatchVel', ctypes.c_double),
+        ('mLateralGroundVel', ctypes.c_double),
+        ('mLongitudinalGroundVel', ctypes.c_double),
+        ('mCamber', ctypes.c_double),
+        ('mLateralForce', ctypes.c_double),
+        ('mLongitudinalForce', ctypes.c_double),
+        ('mTireLoad', ctypes.c_double),
+        ('mGripFract', ctypes.c_double),
+        ('mPressure', ctypes.c_double),  # kPa
+        ('mTemperature', ctypes.c_double * 3),  # Kelvin, left/center/right
+        ('mWear', ctypes.c_double),
+        ('mTerrainName', ctypes.c_char * 16),
+        ('mSurfaceType', ctypes.c_ubyte),
+        ('mFlat', ctypes.c_ubyte),
+        ('mDetached', ctypes.c_ubyte),
+        ('mStaticUndeflectedRadius', ctypes.c_ubyte),
+        ('mVerticalTireDeflection', ctypes.c_double),
+        ('mWheelYLocation', ctypes.c_double),
+        ('mToe', ctypes.c_double),
+        ('mTireCarcassTemperature', ctypes.c_double),
+        ('mTireInnerLayerTemperature', ctypes.c_double * 3),
+        ('mExpansion', ctypes.c_ubyte * 24),
+    ]
+
+
+class RF2VehicleTelemetry(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ('mID', ctypes.c_int32),
+        ('mDeltaTime', ctypes.c_double),
+        ('mElapsedTime', ctypes.c_double),
+        ('mLapNumber', ctypes.c_int32),
+        ('mLapStartET', ctypes.c_double),
+        ('mVehicleName', ctypes.c_char * 64),
+        ('mTrackName', ctypes.c_char * 64),
+        ('mPos', RF2Vec3),
+        ('mLocalVel', RF2Vec3),  # m/s
+        ('mLocalAccel', RF2Vec3),  # m/s^2
+        ('mOri', RF2Vec3 * 3),
+        ('mLocalRot', RF2Vec3),
+        ('mLocalRotAccel', RF2Vec3),
+        ('mGear', ctypes.c_int32),  # -1 = reverse, 0 = neutral
+        ('mEngineRPM', ctypes.c_double),
+        ('mEngineWaterTemp', ctypes.c_double),
+        ('mEngineOilTemp', ctypes.c_double),
+        ('mClutchRPM', ctypes.c_double),
+        ('mUnfilteredThrottle', ctypes.c_double),
+        ('mUnfilteredBrake', ctypes.c_double),
+        ('mUnfilteredSteering', ctypes.c_double),
+        ('mUnfilteredClutch', ctypes.c_double),
+        ('mFilteredThrottle', ctypes.c_double),
+        ('mFilteredBrake', ctypes.c_double),
+        ('mFilteredSteering', ctypes.c_double),
+        ('mFilteredClutch', ctypes.c_double),
+        ('mSteeringShaftTorque', ctypes.c_double),
+        ('mFront3rdDeflection', ctypes.c_double),
+        ('mRear3rdDeflection', ctypes.c_double),
+        ('mFrontWingHeight', ctypes.c_double),
+        ('mFrontRideHeight', ctypes.c_double),
+        ('mRearRideHeight', ctypes.c_double),
+        ('mDrag', ctypes.c_double),
+        ('mFrontDownforce', ctypes.c_double),
+        ('mRearDownforce', ctypes.c_double),
+        ('mFuel', ctypes.c_double),  # liters
+        ('mEngineMaxRPM', ctypes.c_double),
+        ('mScheduledStops', ctypes.c_ubyte),
+        ('mOverheating', ctypes.c_ubyte),
+        ('mDetached', ctypes.c_ubyte),
+        ('mHeadlights', ctypes.c_ubyte),
+        ('mDentSeverity', ctypes.c_ubyte * 8),
+        ('mLastImpactET', ctypes.c_double),
+        ('mLastImpactMagnitude', ctypes.c_double),
+        ('mLastImpactPos', RF2Vec3),
+        ('mEngineTorque', ctypes.c_double),
+        ('mCurrentSector', ctypes.c_int32),
+        ('mSpeedLimiter', ctypes.c_ubyte),
+        ('mMaxGears', ctypes.c_ubyte),
+        ('mFrontTireCompoundIndex', ctypes.c_ubyte),
+        ('mRearTireCompoundIndex', ctypes.c_ubyte),
+        ('mFuelCapacity', ctypes.c_double),
+        ('mFrontFlapActivated', ctypes.c_ubyte),
+        ('mRearFlapActivated', ctypes.c_ubyte),
+        ('mRearFlapLegalStatus', ctypes.c_ubyte),
+        ('mIgnitionStarter', ctypes.c_ubyte),
+        ('mFrontTireCompoundName', ctypes.c_char * 18),
+        ('mRearTireCompoundName', ctypes.c_char * 18),
+        ('mSpeedLimiterAvailable', ctypes.c_ubyte),
+        ('mAntiStallActivated', ctypes.c_ubyte),
+        ('mUnused', ctypes.c_ubyte * 2),
+        ('mVisualSteeringWheelRange', ctypes.c_float),
+        ('mRearBrakeBias', ctypes.c_double),  # 0.0 to 1.0, rear share
+        ('mTurboBoostPressure', ctypes.c_double),
+        ('mPhysicsToGraphicsOffset', ctypes.c_float * 3),
+        ('mPhysicalSteeringWheelRange', ctypes.c_float),
+        ('mExpansion', ctypes.c_ubyte * 152),
+        ('mWheels', RF2Wheel * 4),  # FL, FR, RL, RR
+    ]
+
+
+class RF2Telemetry(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ('mVersionUpdateBegin', ctypes.c_uint32),
+        ('mVersionUpdateEnd', ctypes.c_uint32),
+        ('mBytesUpdatedHint', ctypes.c_int32),
+        ('mNumVehicles', ctypes.c_int32),
+        ('mVehicles', RF2VehicleTelemetry * RF2_MAX_MAPPED_VEHICLES),
+    ]
+
+
+class RF2TelemetryHeader(ctypes.Structure):
+    """Leading fields of RF2Telemetry, copied on their own each tick"""
+    _pack_ = 4
+    _fields_ = RF2Telemetry._fields_[:4]
+
+
+class RF2ScoringInfo(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ('mTrackName', ctypes.c_char * 64),
+        ('mSession', ctypes.c_int32),
+        ('mCurrentET', ctypes.c_double),
+        ('mEndET', ctypes.c_double),
+        ('mMaxLaps', ctypes.c_int32),
+        ('mLapDist', ctypes.c_double),  # track length in meters
+        ('pointer1', ctypes.c_ubyte * 8),
+        ('mNumVehicles', ctypes.c_int32),
+        ('mGamePhase', ctypes.c_ubyte),
+        ('mYellowFlagState', ctypes.c_byte),
+        ('mSectorFlag', ctypes.c_byte * 3),
+        ('mStartLight', ctypes.c_ubyte),
+        ('mNumRedLights', ctypes.c_ubyte),
+        ('mInRealtime', ctypes.c_ubyte),
+        ('mPlayerName', ctypes.c_char * 32),
+        ('mPlrFileName', ctypes.c_char * 64),
+        ('mDarkCloud', ctypes.c_double),
+        ('mRaining', ctypes.c_double),
+        ('mAmbientTemp', ctypes.c_double),
+        ('mTrackTemp', ctypes.c_double),
+        ('mWind', RF2Vec3),
+        ('mMinPathWetness', ctypes.c_double),
+        ('mMaxPathWetness', ctypes.c_double),
+        ('mGameMode', ctypes.c_ubyte),
+        ('mIsPasswordProtected', ctypes.c_ubyte),
+        ('mServerPort', ctypes.c_uint16),
+        ('mServerPublicIP', ctypes.c_uint32),
+        ('mMaxPlayers', ctypes.c_int32),
+        ('mServerName', ctypes.c_char * 32),
+        ('mStartET', ctypes.c_float),
+        ('mAvgPathWetness', ctypes.c_double),
+        ('mExpansion', ctypes.c_ubyte * 200),
+        ('pointer2', ctypes.c_ubyte * 8),
+    ]
+
+
+class RF2VehicleScoring(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ('mID', ctypes.c_int32),
+        ('mDriverName', ctypes.c_char * 32),
+        ('mVehicleName', ctypes.c_char * 64),
+        ('mTotalLaps', ctypes.c_int16),
+        ('mSector', ctypes.c_byte),
+        ('mFinishStatus', ctypes.c_byte),
+        ('mLapDist', ctypes.c_double),  # meters into the lap
+        ('mPathLateral', ctypes.c_double),
+        ('mTrackEdge', ctypes.c_double),
+        ('mBestSector1', ctypes.c_double),
+        ('mBestSector2', ctypes.c_double),
+        ('mBestLapTime', ctypes.c_double),  # negative until set
+        ('mLastSector1', ctypes.c_double),
+        ('mLastSector2', ctypes.c_double),
+        ('mLastLapTime', ctypes.c_double),
+        ('mCurSector1', ctypes.c_double),
+        ('mCurSector2', ctypes.c_double),
+        ('mNumPitstops', ctypes.c_int16),
+        ('mNumPenalties', ctypes.c_int16),
+        ('mIsPlayer', ctypes.c_ubyte),
+        ('mControl', ctypes.c_byte),
+        ('mInPits', ctypes.c_ubyte),
+        ('mPlace', ctypes.c_ubyte),
+        ('mVehicleClass', ctypes.c_char * 32),
+        ('mTimeBehindNext', ctypes.c_double),
+        ('mLapsBehindNext', ctypes.c_int32),
+        ('mTimeBehindLeader', ctypes.c_double),
+        ('mLapsBehindLeader', ctypes.c_int32),
+        ('mLapStartET', ctypes.c_double),
+        ('mPos', RF2Vec3),
+        ('mLocalVel', RF2Vec3),
+        ('mLocalAccel', RF2Vec3),
+        ('mOri', RF2Vec3 * 3),
+        ('mLocalRot', RF2Vec3),
+        ('mLocalRotAccel', RF2Vec3),
+        ('mHeadlights', ctypes.c_ubyte),
+        ('mPitState', ctypes.c_ubyte),
+        ('mServerScored', ctypes.c_ubyte),
+        ('mIndividualPhase', ctypes.c_ubyte),
+        ('mQualification', ctypes.c_int32),
+        ('mTimeIntoLap', ctypes.c_double),
+        ('mEstimatedLapTime', ctypes.c_double),
+        ('mPitGroup', ctypes.c_char * 24),
+        ('mFlag', ctypes.c_ubyte),
+        ('mUnderYellow', ctypes.c_ubyte),
+        ('mCountLapFlag', ctypes.c_ubyte),
+        ('mInGarageStall', ctypes.c_ubyte),
+        ('mUpgradePack', ctypes.c_ubyte * 16),
+        ('mPitLapDist', ctypes.c_float),
+        ('mBestLapSector1', ctypes.c_float),
+        ('mBestLapSector2', ctypes.c_float),
+        ('mExpansion', ctypes.c_ubyte * 48),
+    ]
+
+
+class RF2Scoring(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ('mVersionUpdateBegin', ctypes.c_uint32),
+        ('mVersionUpdateEnd', ctypes.c_uint32),
+        ('mBytesUpdatedHint', ctypes.c_int32),
+        ('mScoringInfo', RF2ScoringInfo),
+        ('mVehicles', RF2VehicleScoring * RF2_MAX_MAPPED_VEHICLES),
+    ]
+
+
+class RF2ScoringHeader(ctypes.Structure):
+    """Version counters of RF2Scoring, copied on their own each tick"""
+    _pack_ = 4
+    _fields_ = RF2Scoring._fields_[:3]
+
+
 class LMUReader(BaseTelemetryReader):
     """
     LMU telemetry reader using shared memory
@@ -26,6 +286,21 @@ class LMUReader(BaseTelemetryReader):
     RF2_SM_RULES = "$rFactor2SMMP_Rules$"
     RF2_SM_EXTENDED = "$rFactor2SMMP_Extended$"
     
+    # Offsets into the mapped buffers, so per-vehicle lookups read only the
+    # bytes they need instead of copying every vehicle
+    TELEMETRY_VEHICLES_OFFSET = RF2Telemetry.mVehicles.offset
+    TELEMETRY_VEHICLE_SIZE = ctypes.sizeof(RF2VehicleTelemetry)
+    SCORING_INFO_OFFSET = RF2Scoring.mScoringInfo.offset
+    SCORING_VEHICLES_OFFSET = RF2Scoring.mVehicles.offset
+    SCORING_VEHICLE_SIZE = ctypes.sizeof(RF2VehicleScoring)
+    SCORING_IS_PLAYER_OFFSET = RF2VehicleScoring.mIsPlayer.offset
+    VEHICLE_ID = struct.Struct('<i')  # RF2VehicleTelemetry.mID
+    
+    GRAVITY = 9.81
+    KELVIN = 273.15
+    KPA_TO_PSI = 0.145038
+    NO_BEST_LAP = 999.0  # Same "no best lap yet" value as demo mode
+    
     def __init__(self):
         super().__init__()
         self.telemetry_map = None
@@ -41,11 +316,26 @@ class LMUReader(BaseTelemetryReader):
         try:
             print("LMU Reader: Attempting to connect to LMU/rF2 shared memory...")
             
-            # TODO: Implement shared memory connection
             # Reference: rFactor 2 Shared Memory Plugin
             # https://github.com/TheIronWolfModding/rF2SharedMemoryMapPlugin
+            self.telemetry_map = mmap.mmap(
+                -1, ctypes.sizeof(RF2Telemetry),
+                tagname=self.RF2_SM_TELEMETRY, access=mmap.ACCESS_READ
+            )
+            self.scoring_map = mmap.mmap(
+                -1, ctypes.sizeof(RF2Scoring),
+                tagname=self.RF2_SM_SCORING, access=mmap.ACCESS_READ
+            )
             
-            return False
+            # Opening a tagname that doesn't exist creates an empty mapping, so
+            # an untouched version counter means the plugin isn't writing
+            header = RF2TelemetryHeader.from_buffer_copy(self.telemetry_map)
+            if header.mVersionUpdateBegin == 0:
+                print("LMU Reader: No data from the rF2 plugin (is LMU running with it enabled?)")
+                await self.disconnect()
+                return False
+            
+            return True
             
         except Exception as e:
             print(f"LMU Reader: Failed to connect: {e}")
@@ -57,38 +347,143 @@ class LMUReader(BaseTelemetryReader):
             return None
         
         try:
-            # TODO: Parse rF2 shared memory data
-            # Telemetry data includes:
-            # - Vehicle telemetry (speed, RPM, gear, etc.)
-            # - Wheel data (tire temps, pressures, wear, etc.)
-            # - Physics data (g-forces, suspension, etc.)
-            # 
-            # Scoring data includes:
-            # - Session information
-            # - Lap times
-            # - Position/standings
-            # - Sector times
+            # Versions differ while the plugin is mid-write; skip torn reads
+            scoring_header = RF2ScoringHeader.from_buffer_copy(self.scoring_map)
+            if scoring_header.mVersionUpdateBegin != scoring_header.mVersionUpdateEnd:
+                return None
             
-            return None
+            scoring_info = RF2ScoringInfo.from_buffer_copy(self.scoring_map, self.SCORING_INFO_OFFSET)
+            player = self._find_player_scoring(scoring_info.mNumVehicles)
+            if not player:
+                return None
+            
+            # Scoring changed between the player lookup and the copies
+            if RF2ScoringHeader.from_buffer_copy(self.scoring_map).mVersionUpdateBegin != scoring_header.mVersionUpdateBegin:
+                return None
+            
+            header = RF2TelemetryHeader.from_buffer_copy(self.telemetry_map)
+            if header.mVersionUpdateBegin != header.mVersionUpdateEnd:
+                return None
+            
+            vehicle = self._find_vehicle_telemetry(header.mNumVehicles, player.mID)
+            if not vehicle:
+                return None
+            
+            # The plugin started another update while we were copying
+            if RF2TelemetryHeader.from_buffer_copy(self.telemetry_map).mVersionUpdateBegin != header.mVersionUpdateBegin:
+                return None
+            
+            velocity = vehicle.mLocalVel
+            accel = vehicle.mLocalAccel
+            fl, fr, rl, rr = vehicle.mWheels
+            fuel_capacity = vehicle.mFuelCapacity
+            track_length = scoring_info.mLapDist
+            
+            return UnifiedTelemetryData(
+                speed=math.sqrt(velocity.x ** 2 + velocity.y ** 2 + velocity.z ** 2) * 3.6,
+                rpm=int(vehicle.mEngineRPM),
+                gear=vehicle.mGear,
+                max_rpm=int(vehicle.mEngineMaxRPM),
+                lap_distance=player.mLapDist / track_length if track_length > 0 else 0.0,
+                lap_time=vehicle.mElapsedTime - vehicle.mLapStartET,
+                lap_number=vehicle.mLapNumber,
+                last_lap_time=max(player.mLastLapTime, 0.0),  # -1 until a lap is set
+                best_lap_time=player.mBestLapTime if player.mBestLapTime > 0 else self.NO_BEST_LAP,
+                throttle=vehicle.mFilteredThrottle,
+                brake=vehicle.mFilteredBrake,
+                clutch=vehicle.mFilteredClutch,
+                steering=vehicle.mFilteredSteering,
+                g_force_lateral=accel.x / self.GRAVITY,
+                g_force_longitudinal=-accel.z / self.GRAVITY,
+                g_force_vertical=accel.y / self.GRAVITY,
+                tire_temp_fl=self._tire_temp(fl),
+                tire_temp_fr=self._tire_temp(fr),
+                tire_temp_rl=self._tire_temp(rl),
+                tire_temp_rr=self._tire_temp(rr),
+                tire_pressure_fl=fl.mPressure * self.KPA_TO_PSI,
+                tire_pressure_fr=fr.mPressure * self.KPA_TO_PSI,
+                tire_pressure_rl=rl.mPressure * self.KPA_TO_PSI,
+                tire_pressure_rr=rr.mPressure * self.KPA_TO_PSI,
+                brake_temp_fl=fl.mBrakeTemp - self.KELVIN,
+                brake_temp_fr=fr.mBrakeTemp - self.KELVIN,
+                brake_temp_rl=rl.mBrakeTemp - self.KELVIN,
+                brake_temp_rr=rr.mBrakeTemp - self.KELVIN,
+                oil_temp=vehicle.mEngineOilTemp,
+                water_temp=vehicle.mEngineWaterTemp,
+                fuel_level=vehicle.mFuel / fuel_capacity if fuel_capacity > 0 else 0.0,
+                fuel=vehicle.mFuel,
+                fuel_laps=0,  # rF2 doesn't provide this directly
+                tc=0,
+                abs=0,
+                brake_bias=1.0 - vehicle.mRearBrakeBias,  # front share, as in ACC
+                engine_map=0,
+                position=player.mPlace,
+                total_cars=scoring_info.mNumVehicles,
+                session_type=self._get_session_type(scoring_info.mSession),
+                session_time_remaining=max(scoring_info.mEndET - scoring_info.mCurrentET, 0.0),
+                track_name=scoring_info.mTrackName.decode('utf-8', 'ignore'),
+                car_name=vehicle.mVehicleName.decode('utf-8', 'ignore'),
+            )
             
         except Exception as e:
             print(f"LMU Reader: Error reading telemetry: {e}")
             return None
     
+    def _find_player_scoring(self, num_vehicles: int) -> Optional[RF2VehicleScoring]:
+        """Copy the scoring entry flagged mIsPlayer, if any"""
+        for index in range(min(num_vehicles, RF2_MAX_MAPPED_VEHICLES)):
+            offset = self.SCORING_VEHICLES_OFFSET + index * self.SCORING_VEHICLE_SIZE
+            if self.scoring_map[offset + self.SCORING_IS_PLAYER_OFFSET]:
+                return RF2VehicleScoring.from_buffer_copy(self.scoring_map, offset)
+        return None
+    
+    def _find_vehicle_telemetry(self, num_vehicles: int, vehicle_id: int) -> Optional[RF2VehicleTelemetry]:
+        """Copy the telemetry entry whose mID matches the player's scoring entry"""
+        # Telemetry and scoring list vehicles in different orders
+        for index in range(min(num_vehicles, RF2_MAX_MAPPED_VEHICLES)):
+            offset = self.TELEMETRY_VEHICLES_OFFSET + index * self.TELEMETRY_VEHICLE_SIZE
+            if self.VEHICLE_ID.unpack_from(self.telemetry_map, offset)[0] == vehicle_id:
+                return RF2VehicleTelemetry.from_buffer_copy(self.telemetry_map, offset)
+        return None
+    
+    def _tire_temp(self, wheel: RF2Wheel) -> float:
+        """Average tread temperature across the tire (left/center/right) in Celsius"""
+        return sum(wheel.mTemperature) / 3 - self.KELVIN
+    
+    def _get_session_type(self, session_code: int) -> str:
+        """Convert rF2 session code to readable string"""
+        if session_code == 0:
+            return "Test Day"
+        if 1 <= session_code <= 4:
+            return "Practice"
+        if 5 <= session_code <= 8:
+            return "Qualifying"
+        if session_code == 9:
+            return "Warmup"
+        if 10 <= session_code <= 13:
+            return "Race"
+        return "Unknown"
+    
     async def disconnect(self):
         """Disconnect from LMU/rF2 shared memory"""
         if self.telemetry_map:
             self.telemetry_map.close()
+            self.telemetry_map = None
         if self.scoring_map:
             self.scoring_map.close()
+            self.scoring_map = None
 
 
 # Reference Implementation Notes:
 # - LMU uses rFactor 2 shared memory plugin
 # - Plugin must be enabled in LMU settings
 # - Multiple memory mapped files (Telemetry, Scoring, Rules, Extended)
-# - Data structures defined in rF2 plugin headers
-# - Update rate: ~60Hz
+# - Data structures defined in rF2 plugin headers (rF2State.h, #pragma pack(4));
+#   the ctypes mirrors above match its sizes (rF2VehicleTelemetry 1888 bytes,
+#   rF2VehicleScoring 584 bytes)
+# - The player is the scoring entry with mIsPlayer set; its mID locates the
+#   matching telemetry entry (the two buffers aren't in the same order)
+# - Scoring updates at ~5Hz, telemetry at ~60Hz
 # 
 # Setup:
 # 1. Install rFactor 2 Shared Memory Plugin for LMU